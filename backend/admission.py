@@ -0,0 +1,200 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+
+# Konfigurasi jalur prioritas
+LANE_INTERACTIVE = 'interactive'
+LANE_BULK = 'bulk'
+DEFAULT_LANE = LANE_INTERACTIVE
+
+LANES = {
+    LANE_INTERACTIVE: {
+        'weight': int(os.environ.get('OCR_INTERACTIVE_WEIGHT', '4')),
+        'queue_size': int(os.environ.get('OCR_INTERACTIVE_QUEUE', '32')),
+    },
+    LANE_BULK: {
+        'weight': int(os.environ.get('OCR_BULK_WEIGHT', '1')),
+        'queue_size': int(os.environ.get('OCR_BULK_QUEUE', '128')),
+    },
+}
+MAX_PER_CLIENT = int(os.environ.get('OCR_MAX_PER_CLIENT', '4'))
+# Alamat proxy yang boleh menentukan identitas klien lewat header
+TRUSTED_PROXIES = {addr.strip() for addr in os.environ.get('OCR_TRUSTED_PROXIES', '').split(',') if addr.strip()}
+WAIT_EMA_ALPHA = 0.2
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; carries the HTTP status and Retry-After seconds"""
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+def client_identity(remote_addr, headers, trusted_proxies=TRUSTED_PROXIES):
+    """
+    Key for the per-client limit. X-Client-Id (e.g. an authenticated user
+    set by the gateway) and X-Forwarded-For are only honoured when the
+    request comes from a trusted proxy; otherwise any caller could pick a
+    new id per request and bypass the limit.
+    """
+    if remote_addr in trusted_proxies:
+        client_id = headers.get('X-Client-Id')
+        if client_id:
+            return client_id
+        forwarded = headers.get('X-Forwarded-For', '').split(',')[0].strip()
+        if forwarded:
+            return forwarded
+    return remote_addr or 'unknown'
+
+class Ticket:
+    def __init__(self, lane, client_id):
+        self.lane = lane
+        self.client_id = client_id
+        self.enqueued_at = time.time()
+        self.granted_at = None
+        self.granted = False
+
+class AdmissionController:
+    """
+    Bounded per-lane queues in front of the OCR pipeline.
+    Free slots go to the lanes by smooth weighted round robin, so bulk
+    traffic still progresses but cannot starve interactive requests.
+    Clients over their concurrency limit get 429, full queues get 503;
+    both carry a Retry-After estimate.
+    """
+
+    def __init__(self, slots, lanes=LANES, max_per_client=MAX_PER_CLIENT):
+        self.slots = max(1, slots)
+        self.lanes = lanes
+        self.max_per_client = max_per_client
+
+        self._cond = threading.Condition()
+        self._free = self.slots
+        self._queues = {lane: deque() for lane in lanes}
+        self._current = {lane: 0 for lane in lanes}
+        self._per_client = {}
+        self._service_time = 1.0
+        self._stats = {lane: {'in_flight': 0, 'admitted': 0, 'rejected': 0, 'timed_out': 0,
+                              'avg_wait': 0.0, 'max_wait': 0.0} for lane in lanes}
+
+    def acquire(self, lane, client_id, timeout=None):
+        """Wait for an OCR slot in the given lane; raises AdmissionRejected when shed"""
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown request class: {lane}. Use {', '.join(sorted(self.lanes))}")
+
+        ticket = Ticket(lane, client_id)
+        with self._cond:
+            self._check(lane, client_id)
+            queue = self._queues[lane]
+            self._per_client[client_id] = self._per_client.get(client_id, 0) + 1
+            queue.append(ticket)
+            self._dispatch()
+
+            deadline = None if timeout is None else time.time() + timeout
+            while not ticket.granted:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    queue.remove(ticket)
+                    self._drop_client(client_id)
+                    self._stats[lane]['timed_out'] += 1
+                    raise AdmissionRejected('Timed out waiting in queue', 503, self._retry_after(lane))
+                self._cond.wait(remaining)
+
+        return ticket
+
+    def check(self, lane, client_id):
+        """
+        Raise AdmissionRejected if acquire() would be shed right now, without
+        taking a slot; lets callers refuse before doing expensive work.
+        """
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown request class: {lane}. Use {', '.join(sorted(self.lanes))}")
+        with self._cond:
+            self._check(lane, client_id)
+
+    def release(self, ticket):
+        with self._cond:
+            if not ticket.granted:
+                return
+            ticket.granted = False
+            service_time = time.time() - ticket.granted_at
+            self._service_time += WAIT_EMA_ALPHA * (service_time - self._service_time)
+            self._stats[ticket.lane]['in_flight'] -= 1
+            self._drop_client(ticket.client_id)
+            self._free += 1
+            self._dispatch()
+
+    def get_stats(self):
+        with self._cond:
+            lanes = {}
+            for lane, stats in self._stats.items():
+                lanes[lane] = dict(stats, queue_depth=len(self._queues[lane]),
+                                   queue_size=self.lanes[lane]['queue_size'],
+                                   weight=self.lanes[lane]['weight'],
+                                   avg_wait=round(stats['avg_wait'], 4),
+                                   max_wait=round(stats['max_wait'], 4))
+            return {
+                'slots': self.slots,
+                'free_slots': self._free,
+                'max_per_client': self.max_per_client,
+                'avg_service_time': round(self._service_time, 4),
+                'lanes': lanes,
+            }
+
+    def _check(self, lane, client_id):
+        if self.max_per_client > 0 and self._per_client.get(client_id, 0) >= self.max_per_client:
+            self._stats[lane]['rejected'] += 1
+            raise AdmissionRejected('Too many concurrent requests for this client', 429,
+                                    self._retry_after(lane))
+        if len(self._queues[lane]) >= self.lanes[lane]['queue_size']:
+            self._stats[lane]['rejected'] += 1
+            raise AdmissionRejected('Server busy, queue is full', 503, self._retry_after(lane))
+
+    def _dispatch(self):
+        """Grant free slots to queued tickets (caller holds the lock)"""
+        granted = False
+        while self._free > 0:
+            lane = self._next_lane()
+            if lane is None:
+                break
+            ticket = self._queues[lane].popleft()
+            ticket.granted = True
+            ticket.granted_at = time.time()
+            self._free -= 1
+            granted = True
+
+            stats = self._stats[lane]
+            wait = ticket.granted_at - ticket.enqueued_at
+            stats['in_flight'] += 1
+            stats['admitted'] += 1
+            stats['avg_wait'] += WAIT_EMA_ALPHA * (wait - stats['avg_wait'])
+            stats['max_wait'] = max(stats['max_wait'], wait)
+        if granted:
+            self._cond.notify_all()
+
+    def _next_lane(self):
+        """Smooth weighted round robin over lanes that have queued tickets"""
+        active = [lane for lane, queue in self._queues.items() if queue]
+        if not active:
+            return None
+        total = 0
+        for lane in active:
+            self._current[lane] += self.lanes[lane]['weight']
+            total += self.lanes[lane]['weight']
+        best = max(active, key=lambda lane: self._current[lane])
+        self._current[best] -= total
+        return best
+
+    def _drop_client(self, client_id):
+        count = self._per_client.get(client_id, 0) - 1
+        if count > 0:
+            self._per_client[client_id] = count
+        else:
+            self._per_client.pop(client_id, None)
+
+    def _retry_after(self, lane):
+        """Seconds until the lane's queue should have drained one round"""
+        backlog = len(self._queues[lane]) + 1
+        return max(1, int(math.ceil(backlog * self._service_time / self.slots)))
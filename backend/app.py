@@ -1,12 +1,30 @@
 import os
 import cv2
 import numpy as np
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from tensorflow import keras
+import json
+import re
+import tempfile
+import threading
 import time
 import traceback
+from contextlib import nullcontext
+
+import debug_artifacts
+from debug_artifacts import debug_print, save_artifact, artifact_name
+from storage import UploadStore
+import triage
+from budget import Deadline, deadline_from_request, tesseract_kwargs, STAGE_RESERVE
+from language import DEFAULT_LANG, AUTO_LANG, FALLBACK_LANG, normalize_lang, detect_language
+import documents
+from utils import find_text_boxes, group_boxes_into_lines
+from sessions import SessionStore
+import resources
+from admission import AdmissionController, AdmissionRejected, DEFAULT_LANE, client_identity
+import profiling
 
 try:
     import pytesseract
@@ -15,13 +33,16 @@ try:
 except:
     pytesseract = None
 
+# Batasi thread OpenCV/TensorFlow/Tesseract sebelum TensorFlow dipakai
+resources.configure_threads()
+
 # Inisialisasi Flask
 app = Flask(__name__, static_folder='../frontend', template_folder='../frontend')
 CORS(app)
 
 # Konfigurasi
-UPLOAD_FOLDER = '../static/uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'gif'}
+UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'static', 'uploads')
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'gif', 'tif', 'tiff', 'pdf'}
 MODEL_PATH = 'model_cnn.h5'
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
@@ -30,6 +51,16 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 # Buat folder jika belum ada
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Penyimpanan upload berbasis hash konten
+upload_store = UploadStore(UPLOAD_FOLDER)
+
+# Sesi OCR inkremental untuk frame berurutan
+session_store = SessionStore()
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Antrian prioritas interaktif/bulk di depan pipeline OCR
+admission_controller = AdmissionController(resources.OCR_CONCURRENCY)
+
 # Global variables
 model = None
 characters = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
@@ -78,6 +109,8 @@ def preprocess_image(image_path):
         if np.mean(binary) > 127:
             binary = cv2.bitwise_not(binary)
         
+        save_artifact(artifact_name(image_path, 'cnn_binary'), binary)
+        
         resized = cv2.resize(binary, (28, 28))
         normalized = resized.astype('float32') / 255.0
         processed = np.expand_dims(normalized, axis=-1)
@@ -110,9 +143,10 @@ def predict_text(image_array):
         print(f"Error in prediction: {e}")
         return '?', 0.0
 
-def enhanced_pytesseract_ocr(image_path):
+def enhanced_pytesseract_ocr(image_path, deadline=None, lang=FALLBACK_LANG):
     """
     Enhanced OCR with pytesseract that preserves formatting
+    Remaining configs are skipped once the deadline runs out.
     """
     try:
         if pytesseract is None:
@@ -137,12 +171,15 @@ def enhanced_pytesseract_ocr(image_path):
         ]
         
         for config in configs:
+            if deadline is not None and not deadline.check('enhanced'):
+                break
             try:
                 ocr_data = pytesseract.image_to_data(
                     pil_img, 
-                    lang='eng+ind',
+                    lang=lang,
                     config=config,
-                    output_type=pytesseract.Output.DICT
+                    output_type=pytesseract.Output.DICT,
+                    **tesseract_kwargs(deadline)
                 )
 
                 reconstructed_text = ""
@@ -192,48 +229,52 @@ def detect_text_regions(image_path):
         
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-        methods = [
-            cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1],
-            cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                cv2.THRESH_BINARY, 11, 2),
-        ]
-        
-        all_boxes = []
-        
-        for binary in methods:
-
-            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            for contour in contours:
-                x, y, w, h = cv2.boundingRect(contour)
-                
-                if w > 20 and h > 20:
-                    merged = False
-                    for i, (bx, by, bw, bh) in enumerate(all_boxes):
-                        if (abs(x - bx) < 50 and abs(y - by) < 50) or \
-                        (x < bx + bw and x + w > bx and y < by + bh and y + h > by):
-                            new_x = min(x, bx)
-                            new_y = min(y, by)
-                            new_w = max(x + w, bx + bw) - new_x
-                            new_h = max(y + h, by + bh) - new_y
-                            all_boxes[i] = (new_x, new_y, new_w, new_h)
-                            merged = True
-                            break
-                    
-                    if not merged:
-                        all_boxes.append((x, y, w, h))
-        
-        all_boxes.sort(key=lambda box: (box[1] // 20, box[0]))
-        
-        return all_boxes
+        return find_text_boxes(gray)
         
     except Exception as e:
         print(f"Error detecting text regions: {e}")
         return []
 
-def ocr_with_line_detection(image_path):
+def ocr_box(gray, box, lang=FALLBACK_LANG, deadline=None):
+    """
+    OCR a single text box of a grayscale image
+    Returns (text, confidence); confidence is None when Tesseract reported none above 30.
+    """
+    x, y, w, h = box
+    roi = gray[y:y+h, x:x+w]
+    if roi.size == 0:
+        return "", None
+
+    roi_processed = cv2.threshold(roi, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+    pil_roi = PILImage.fromarray(roi_processed)
+
+    ocr_result = pytesseract.image_to_string(
+        pil_roi,
+        lang=lang,
+        config='--oem 3 --psm 7 -c preserve_interword_spaces=1',
+        **tesseract_kwargs(deadline)
+    ).strip()
+
+    if not ocr_result:
+        return "", None
+
+    ocr_data = pytesseract.image_to_data(
+        pil_roi,
+        lang=lang,
+        config='--oem 3 --psm 7',
+        output_type=pytesseract.Output.DICT,
+        **tesseract_kwargs(deadline)
+    )
+
+    confidences = [c for c in ocr_data['conf'] if c > 30]
+    confidence = np.mean(confidences) / 100.0 if confidences else None
+    return ocr_result, confidence
+
+def ocr_with_line_detection(image_path, deadline=None, lang=FALLBACK_LANG):
     """
     OCR with explicit line detection
+    Stops at the current box once the deadline runs out and returns the lines read so far.
     """
     try:
         if pytesseract is None:
@@ -246,28 +287,15 @@ def ocr_with_line_detection(image_path):
         text_boxes = detect_text_regions(image_path)
         
         if not text_boxes:
-            return enhanced_pytesseract_ocr(image_path)
+            return enhanced_pytesseract_ocr(image_path, deadline=deadline, lang=lang)
 
-        lines = []
-        current_line = []
-        last_y = -1
-        
-        for box in text_boxes:
-            x, y, w, h = box
-            
-            if last_y == -1:
-                last_y = y
+        lines = group_boxes_into_lines(text_boxes)
 
-            if abs(y - last_y) > h * 0.5:
-                if current_line:
-                    lines.append(sorted(current_line, key=lambda b: b[0]))
-                    current_line = []
-            
-            current_line.append(box)
-            last_y = y
-        
-        if current_line:
-            lines.append(sorted(current_line, key=lambda b: b[0]))
+        if debug_artifacts.is_active():
+            boxes_img = img.copy()
+            for x, y, w, h in text_boxes:
+                cv2.rectangle(boxes_img, (x, y), (x + w, y + h), (0, 0, 255), 2)
+            save_artifact(artifact_name(image_path, 'regions'), boxes_img)
 
         full_text = ""
         total_confidence = 0.0
@@ -275,41 +303,26 @@ def ocr_with_line_detection(image_path):
         
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         
+        out_of_time = False
+        
         for line_idx, line_boxes in enumerate(lines):
             line_text = ""
             line_confidence = 0.0
             box_count = 0
             
-            for box_idx, (x, y, w, h) in enumerate(line_boxes):
-
-                roi = gray[y:y+h, x:x+w]
-                if roi.size == 0:
-                    continue
+            for box in line_boxes:
+                if deadline is not None and not deadline.check('line_detection'):
+                    out_of_time = True
+                    break
 
-                roi_processed = cv2.threshold(roi, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-
-                pil_roi = PILImage.fromarray(roi_processed)
-                
                 try:
-                    ocr_result = pytesseract.image_to_string(
-                        pil_roi,
-                        lang='eng+ind',
-                        config='--oem 3 --psm 7 -c preserve_interword_spaces=1'
-                    ).strip()
+                    ocr_result, box_confidence = ocr_box(gray, box, lang=lang, deadline=deadline)
                     
                     if ocr_result:
                         line_text += ocr_result + " "
 
-                        ocr_data = pytesseract.image_to_data(
-                            pil_roi,
-                            lang='eng+ind',
-                            config='--oem 3 --psm 7',
-                            output_type=pytesseract.Output.DICT
-                        )
-                        
-                        confidences = [c for c in ocr_data['conf'] if c > 30]
-                        if confidences:
-                            line_confidence += np.mean(confidences) / 100.0
+                        if box_confidence is not None:
+                            line_confidence += box_confidence
                             box_count += 1
                             
                 except Exception as e:
@@ -324,6 +337,9 @@ def ocr_with_line_detection(image_path):
                 if box_count > 0:
                     total_confidence += line_confidence / box_count
                     line_count += 1
+            
+            if out_of_time:
+                break
         
         avg_confidence = total_confidence / line_count if line_count > 0 else 0.5
         
@@ -331,10 +347,14 @@ def ocr_with_line_detection(image_path):
         
     except Exception as e:
         print(f"Error in line detection OCR: {e}")
-        return enhanced_pytesseract_ocr(image_path)
+        return enhanced_pytesseract_ocr(image_path, deadline=deadline, lang=lang)
 
-def simple_ocr(image_path):
-    """Simple OCR implementation"""
+def simple_ocr(image_path, quick=False, deadline=None, lang=FALLBACK_LANG):
+    """
+    Simple OCR implementation
+    quick=True only tries the Otsu image with psm 6 and 11 (for sparse images)
+    Remaining passes are skipped once the deadline runs out.
+    """
     try:
         if pytesseract is None:
             return "", 0.0
@@ -345,12 +365,19 @@ def simple_ocr(image_path):
         
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-        preprocessed = [
-            gray,
-            cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1],
-            cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                cv2.THRESH_BINARY, 11, 2),
-        ]
+        if quick:
+            preprocessed = [
+                cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1],
+            ]
+            psm_modes = [6, 11]
+        else:
+            preprocessed = [
+                gray,
+                cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1],
+                cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                    cv2.THRESH_BINARY, 11, 2),
+            ]
+            psm_modes = [3, 4, 6, 11]
         
         best_text = ""
         best_conf = 0.0
@@ -359,13 +386,16 @@ def simple_ocr(image_path):
             try:
                 pil_img = PILImage.fromarray(proc)
 
-                for psm in [3, 4, 6, 11]:
+                for psm in psm_modes:
+                    if deadline is not None and not deadline.check('simple_ocr'):
+                        break
                     config = f'--oem 3 --psm {psm} -c preserve_interword_spaces=1'
                     
                     text = pytesseract.image_to_string(
                         pil_img,
-                        lang='eng+ind',
-                        config=config
+                        lang=lang,
+                        config=config,
+                        **tesseract_kwargs(deadline)
                     ).strip()
                     
                     if text:
@@ -383,17 +413,141 @@ def simple_ocr(image_path):
                 print(f"Simple OCR error: {e}")
                 continue
         
-        if not best_text:
-            filename = os.path.splitext(os.path.basename(image_path))[0]
-            best_text = filename.replace('_', ' ').upper()
-            best_conf = 0.3
-        
         return best_text, best_conf
         
     except Exception as e:
         print(f"Error in simple OCR: {e}")
         return "GAGAL MEMBACA TEKS", 0.1
 
+def _run_stage(stage, func, *args, **kwargs):
+    """Run a pipeline stage and record its duration for triage estimates"""
+    stage_start = time.time()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        triage.record_stage(stage, time.time() - stage_start)
+
+def _has_time(deadline, stage):
+    """Only start a fallback stage when enough of the budget is left"""
+    return deadline is None or deadline.check(stage, reserve=STAGE_RESERVE)
+
+def run_ocr_pipeline(filepath, ocr_mode='auto', use_triage=True, deadline=None, lang=DEFAULT_LANG):
+    """
+    Run the OCR chain for one image file.
+    Triage classifies the image first so blank images skip Tesseract and
+    the CNN, graphics in auto mode only get the quick simple OCR pass, and
+    sparse images get the quick pass as their fallback.
+    With a deadline, fallback stages are cut when time is short and the
+    best text so far is returned with 'partial' set.
+    lang='auto' detects a single language model on a sample region first.
+    """
+    triage_info = None
+    category = triage.TRIAGE_DENSE
+    if use_triage:
+        triage_info = triage.triage_image(filepath)
+        if triage_info is not None:
+            category = triage_info['category']
+            debug_print(f"Triage: {category} ({triage_info['reason']})")
+
+    # Tahap terburuk yang akan dijalankan tanpa triage
+    if pytesseract is None:
+        default_stages = ['simple_ocr', 'cnn']
+    elif ocr_mode in ('line_detection', 'enhanced'):
+        default_stages = [ocr_mode, 'cnn']
+    else:
+        default_stages = ['line_detection', 'simple_ocr', 'cnn']
+    stages_run = []
+    text, confidence = "", 0.0
+
+    lang_detection = None
+    if lang == AUTO_LANG:
+        if category != triage.TRIAGE_NO_TEXT and pytesseract is not None:
+            stages_run.append('lang_detection')
+            lang, lang_detection = _run_stage('lang_detection', detect_language, filepath, deadline=deadline)
+            debug_print(f"Language: {lang}")
+        else:
+            lang = FALLBACK_LANG
+
+    if category == triage.TRIAGE_NO_TEXT:
+        debug_print("No text detected, skipping OCR...")
+    elif ocr_mode == 'line_detection' and pytesseract is not None:
+        debug_print("Using line detection OCR...")
+        stages_run.append('line_detection')
+        text, confidence = _run_stage('line_detection', ocr_with_line_detection, filepath, deadline=deadline, lang=lang)
+    elif ocr_mode == 'enhanced' and pytesseract is not None:
+        debug_print("Using enhanced OCR...")
+        stages_run.append('enhanced')
+        text, confidence = _run_stage('enhanced', enhanced_pytesseract_ocr, filepath, deadline=deadline, lang=lang)
+    elif category == triage.TRIAGE_GRAPHICS and pytesseract is not None:
+        debug_print("Graphics-like image, using quick simple OCR...")
+        stages_run.append('simple_ocr_quick')
+        text, confidence = _run_stage('simple_ocr_quick', simple_ocr, filepath,
+                                      quick=True, deadline=deadline, lang=lang)
+    elif pytesseract is not None:
+        debug_print("Using auto mode OCR...")
+        stages_run.append('line_detection')
+        text, confidence = _run_stage('line_detection', ocr_with_line_detection, filepath, deadline=deadline, lang=lang)
+        if (not text or len(text.strip()) < 3) and _has_time(deadline, 'simple_ocr'):
+            if category == triage.TRIAGE_SPARSE:
+                stages_run.append('simple_ocr_quick')
+                text, confidence = _run_stage('simple_ocr_quick', simple_ocr, filepath,
+                                              quick=True, deadline=deadline, lang=lang)
+            else:
+                stages_run.append('simple_ocr')
+                text, confidence = _run_stage('simple_ocr', simple_ocr, filepath, deadline=deadline, lang=lang)
+    else:
+        debug_print("Pytesseract not available, using simple OCR...")
+        stages_run.append('simple_ocr')
+        text, confidence = _run_stage('simple_ocr', simple_ocr, filepath, deadline=deadline, lang=lang)
+
+    if category != triage.TRIAGE_NO_TEXT and (not text or len(text.strip()) < 2) \
+            and _has_time(deadline, 'cnn'):
+        debug_print("Trying CNN model...")
+        stages_run.append('cnn')
+        processed_image = preprocess_image(filepath)
+        if processed_image is not None:
+            char, conf = _run_stage('cnn', predict_text, processed_image)
+            text = char
+            confidence = conf
+
+    if text:
+        lines = []
+        for line in text.split('\n'):
+            cleaned_line = ' '.join(line.split())
+            if cleaned_line:
+                lines.append(cleaned_line)
+        text = '\n'.join(lines)
+
+    if triage_info is not None:
+        if category == triage.TRIAGE_NO_TEXT:
+            skipped = default_stages
+        elif category == triage.TRIAGE_GRAPHICS and 'simple_ocr_quick' in stages_run:
+            skipped = ['line_detection', 'simple_ocr']
+        elif 'simple_ocr_quick' in stages_run:
+            skipped = ['simple_ocr']
+        else:
+            skipped = []
+        saved = triage.estimate_stages(skipped)
+        if 'simple_ocr_quick' in stages_run:
+            saved -= triage.estimate_stages(['simple_ocr_quick'])
+        saved -= triage_info['triage_time']
+        triage_info['skipped_stages'] = skipped
+        triage_info['estimated_time_saved'] = round(max(0.0, saved), 3)
+
+    # Panggilan Tesseract terakhir bisa terpotong oleh timeout
+    if deadline is not None and stages_run and deadline.expired():
+        deadline.mark_exhausted(stages_run[-1])
+
+    return {
+        'text': text,
+        'confidence': float(confidence),
+        'stages': stages_run,
+        'triage': triage_info,
+        'partial': deadline is not None and deadline.exhausted,
+        'lang': lang,
+        'lang_detection': lang_detection,
+    }
+
 # Routes
 @app.route('/')
 def serve_index():
@@ -412,14 +566,31 @@ def health_check():
         'status': 'healthy',
         'model_loaded': model is not None,
         'pytesseract_available': pytesseract is not None,
-        'endpoints': ['/api/upload', '/api/health', '/']
+        'debug_artifacts': debug_artifacts.get_stats(),
+        'upload_storage': upload_store.get_stats(),
+        'stage_times': triage.get_stage_times(),
+        'pdf_supported': documents.pdf_supported(),
+        'sessions': session_store.get_stats(),
+        'threads': resources.get_settings(),
+        'admission': admission_controller.get_stats(),
+        'profiling': {
+            'sample_rate': profiling.PROFILE_SAMPLE_RATE,
+            'buffered': len(profiling.list_profiles())
+        },
+        'endpoints': ['/api/upload', '/api/session/<session_id>/frame', '/api/health',
+                      '/api/admin/profiles', '/']
     })
 
 @app.route('/api/upload', methods=['POST'])
 def upload_image():
     """Handle image upload for OCR"""
     start_time = time.time()
-    
+    deadline = deadline_from_request(
+        request.form.get('deadline_ms') or request.headers.get('X-OCR-Deadline-Ms'),
+        start=start_time
+    )
+
+    # Validasi sebelum masuk antrian agar request invalid tidak menunggu
     if 'image' not in request.files:
         return jsonify({
             'success': False,
@@ -437,63 +608,139 @@ def upload_image():
     if not allowed_file(file.filename):
         return jsonify({
             'success': False,
-            'error': 'File type not allowed. Use PNG, JPG, JPEG, or BMP'
+            'error': 'File type not allowed. Use PNG, JPG, JPEG, BMP, GIF, TIFF or PDF'
         }), 400
-    
+
+    try:
+        lang = normalize_lang(request.form.get('lang'))
+        lane, client_id = _request_lane()
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+    debug_enabled = debug_artifacts.begin_request(
+        force=request.form.get('debug', '').lower() in ('1', 'true', 'yes')
+    )
+    try:
+        return _handle_upload(start_time, debug_enabled, deadline, file, lang, lane, client_id)
+    finally:
+        debug_artifacts.end_request()
+
+def _request_lane():
+    """
+    Lane (X-Request-Class header or 'priority' field) and client id of the request.
+    Raises ValueError for unknown lanes.
+    """
+    lane = (request.headers.get('X-Request-Class') or request.form.get('priority') or DEFAULT_LANE).lower()
+    if lane not in admission_controller.lanes:
+        raise ValueError(f"Unknown request class: {lane}. Use {', '.join(sorted(admission_controller.lanes))}")
+    client_id = client_identity(request.remote_addr, request.headers)
+    return lane, client_id
+
+def _request_profiler():
+    """
+    RequestProfiler for this request when an admin asked for it ('profile'
+    field plus X-Admin-Token) or the request was sampled, otherwise None.
+    Handlers enter it only around the OCR work after admission, so the
+    queue wait is never part of a trace.
+    """
+    requested = request.form.get('profile', '').lower() in ('1', 'true', 'yes')
+    if not profiling.should_profile(requested, request.headers.get('X-Admin-Token')):
+        return None
+    image = request.files.get('image')
+    label = f"{request.path} {image.filename if image else ''}".strip()
+    return profiling.RequestProfiler(label, mode=request.form.get('profile_mode', profiling.PROFILE_DEFAULT_MODE))
+
+def _with_profile_id(response, profiler):
+    if profiler is not None and profiler.profile_id is not None:
+        response.headers['X-Profile-Id'] = str(profiler.profile_id)
+    return response
+
+def _rejected_response(error):
+    response = jsonify({
+        'success': False,
+        'error': str(error),
+        'retry_after': error.retry_after
+    })
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def _handle_upload(start_time, debug_enabled, deadline, file, lang, lane, client_id):
+    filename = secure_filename(file.filename)
+    ext = os.path.splitext(filename)[1].lower()
+
+    # Tolak atau antri sebelum upload ditulis ke disk. Gambar tunggal langsung
+    # mengambil slot; dokumen mengambil tiket per halaman nanti, jadi di sini
+    # hanya dicek apakah klien/antrian masih menerima.
+    ticket = None
     try:
-        # Simpan uploaded file
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        if ext.lstrip('.') in documents.DOCUMENT_EXTENSIONS:
+            admission_controller.check(lane, client_id)
+        else:
+            ticket = admission_controller.acquire(lane, client_id, timeout=max(0.0, deadline.remaining()))
+    except AdmissionRejected as e:
+        return _rejected_response(e)
+
+    stored = None
+    try:
+        # Simpan uploaded file (berbasis hash konten)
+        stored = upload_store.put(file.stream, ext)
+        filepath = stored.path
         
-        print(f"Processing file: {filepath}")
+        debug_print(f"Processing file: {filepath}")
 
         ocr_mode = request.form.get('ocr_mode', 'auto')
+        use_triage = request.form.get('triage', '1').lower() not in ('0', 'false', 'no')
 
-        if ocr_mode == 'line_detection' and pytesseract is not None:
-            print("Using line detection OCR...")
-            text, confidence = ocr_with_line_detection(filepath)
-        elif ocr_mode == 'enhanced' and pytesseract is not None:
-            print("Using enhanced OCR...")
-            text, confidence = enhanced_pytesseract_ocr(filepath)
-        elif pytesseract is not None:
-            print("Using auto mode OCR...")
-            text, confidence = ocr_with_line_detection(filepath)
-            if not text or len(text.strip()) < 3:
-                text, confidence = simple_ocr(filepath)
-        else:
-            print("Pytesseract not available, using simple OCR...")
-            text, confidence = simple_ocr(filepath)
-
-        if not text or len(text.strip()) < 2:
-            print("Trying CNN model...")
-            processed_image = preprocess_image(filepath)
-            if processed_image is not None:
-                char, conf = predict_text(processed_image)
-                text = char
-                confidence = conf
-
-        if text:
-            lines = []
-            for line in text.split('\n'):
-                cleaned_line = ' '.join(line.split())
-                if cleaned_line:
-                    lines.append(cleaned_line)
-            text = '\n'.join(lines)
+        if ticket is None and documents.is_multipage(filepath, ext):
+            # Setiap halaman masuk antrian sendiri di jalur yang sama.
+            # Halaman diproses di thread pool, jadi stream tidak diprofil.
+            response = _stream_document(stored, filename, ext, ocr_mode, use_triage, lang,
+                                        lane, client_id, deadline.budget_ms,
+                                        documents.parse_dpi(request.form.get('dpi')), start_time)
+            # File upload sekarang dilepas oleh generator stream
+            stored = None
+            return response
+
+        if ticket is None:
+            # GIF satu frame: baru sekarang diketahui bukan dokumen
+            try:
+                ticket = admission_controller.acquire(lane, client_id, timeout=max(0.0, deadline.remaining()))
+            except AdmissionRejected as e:
+                return _rejected_response(e)
+
+        profiler = _request_profiler()
+        with profiler or nullcontext():
+            result = run_ocr_pipeline(filepath, ocr_mode, use_triage=use_triage, deadline=deadline, lang=lang)
+        admission_controller.release(ticket)
+        ticket = None
+        text = result['text']
+        confidence = result['confidence']
 
         processing_time = time.time() - start_time
         
-        return jsonify({
+        return _with_profile_id(jsonify({
             'success': True,
             'text': text,
             'confidence': float(confidence),
             'processing_time': round(processing_time, 3),
             'filename': filename,
+            'content_hash': stored.content_hash,
             'line_count': text.count('\n') + 1 if text else 0,
             'char_count': len(text) if text else 0,
             'ocr_mode_used': ocr_mode if pytesseract else 'simple',
+            'triage': result['triage'],
+            'stages': result['stages'],
+            'partial': result['partial'],
+            'lang': result['lang'],
+            'lang_detection': result['lang_detection'],
+            'budget': deadline.to_dict(),
+            'debug_artifacts': debug_enabled,
             'message': 'OCR processed successfully'
-        })
+        }), profiler)
         
     except Exception as e:
         print(f"Error processing upload: {e}")
@@ -502,7 +749,285 @@ def upload_image():
             'success': False,
             'error': str(e)[:200]
         }), 500
+    finally:
+        if ticket is not None:
+            admission_controller.release(ticket)
+        upload_store.release(stored)
+
+
+@app.route('/api/session/<session_id>/frame', methods=['POST'])
+def session_frame(session_id):
+    """
+    OCR one frame of a session. Only regions that changed since the
+    previous frame of the same session are OCRed again.
+    """
+    debug_artifacts.begin_request(force=request.form.get('debug', '').lower() in ('1', 'true', 'yes'))
+    try:
+        return _handle_session_frame(session_id)
+    finally:
+        debug_artifacts.end_request()
+
+def _handle_session_frame(session_id):
+    start_time = time.time()
+
+    if not SESSION_ID_PATTERN.match(session_id):
+        return jsonify({
+            'success': False,
+            'error': 'Invalid session id'
+        }), 400
+
+    if 'image' not in request.files or request.files['image'].filename == '':
+        return jsonify({
+            'success': False,
+            'error': 'No image file provided'
+        }), 400
+
+    if pytesseract is None:
+        return jsonify({
+            'success': False,
+            'error': 'Pytesseract not available'
+        }), 503
+
+    try:
+        lang = normalize_lang(request.form.get('lang'))
+        if lang == AUTO_LANG:
+            lang = FALLBACK_LANG
+        lane, client_id = _request_lane()
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+    try:
+        # Frame tidak disimpan ke disk, langsung didekode dari memori
+        data = np.frombuffer(request.files['image'].read(), dtype=np.uint8)
+        gray = cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            return jsonify({
+                'success': False,
+                'error': 'Cannot read image'
+            }), 400
+
+        deadline = deadline_from_request(
+            request.form.get('deadline_ms') or request.headers.get('X-OCR-Deadline-Ms'),
+            start=start_time
+        )
+
+        def ocr_region(frame_gray, box):
+            return ocr_box(frame_gray, box, lang=lang, deadline=deadline)
+
+        try:
+            ticket = admission_controller.acquire(lane, client_id, timeout=max(0.0, deadline.remaining()))
+        except AdmissionRejected as e:
+            return _rejected_response(e)
+
+        profiler = _request_profiler()
+        try:
+            session = session_store.get(session_id)
+            with session.lock, profiler or nullcontext():
+                result = session.update(gray, ocr_region, deadline=deadline)
+        finally:
+            admission_controller.release(ticket)
+
+        result.update({
+            'success': True,
+            'session_id': session_id,
+            'lang': lang,
+            'partial': deadline.exhausted,
+            'budget': deadline.to_dict(),
+            'processing_time': round(time.time() - start_time, 3),
+        })
+        return _with_profile_id(jsonify(result), profiler)
+
+    except Exception as e:
+        print(f"Error processing session frame: {e}")
+        print(traceback.format_exc())
+        return jsonify({
+            'success': False,
+            'error': str(e)[:200]
+        }), 500
+
+@app.route('/api/session/<session_id>', methods=['DELETE'])
+def end_session(session_id):
+    """Drop the cached frame and region texts of a session"""
+    return jsonify({
+        'success': True,
+        'removed': session_store.remove(session_id)
+    })
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def admin_list_profiles():
+    """List captured request profiles (newest last)"""
+    if not profiling.is_admin(request.headers.get('X-Admin-Token')):
+        return jsonify({
+            'success': False,
+            'error': 'Forbidden'
+        }), 403
+    return jsonify({
+        'success': True,
+        'profiles': profiling.list_profiles()
+    })
+
+@app.route('/api/admin/profiles/<int:profile_id>', methods=['GET'])
+def admin_get_profile(profile_id):
+    """Download a profile as pstats, text or collapsed stacks (?format=)"""
+    if not profiling.is_admin(request.headers.get('X-Admin-Token')):
+        return jsonify({
+            'success': False,
+            'error': 'Forbidden'
+        }), 403
+
+    record = profiling.get_profile(profile_id)
+    if record is None:
+        return jsonify({
+            'success': False,
+            'error': 'Profile not found'
+        }), 404
+
+    export_format = request.args.get('format', 'pstats' if 'stats' in record else 'collapsed')
+    try:
+        if export_format == 'pstats':
+            if 'stats' not in record:
+                raise ValueError('pstats is only available for cprofile profiles')
+            return Response(profiling.export_pstats(record), mimetype='application/octet-stream', headers={
+                'Content-Disposition': f'attachment; filename=profile_{profile_id}.pstats'
+            })
+        if export_format == 'collapsed':
+            return Response(profiling.export_collapsed(record), mimetype='text/plain', headers={
+                'Content-Disposition': f'attachment; filename=profile_{profile_id}.folded'
+            })
+        if export_format == 'text':
+            return Response(profiling.export_text(record), mimetype='text/plain')
+        raise ValueError('Unknown format. Use pstats, collapsed or text')
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+def _ocr_page_image(page_no, image, ocr_mode, use_triage, lang, lane, client_id, budget_ms, debug_state):
+    """
+    OCR one rasterized page; each page gets its own time budget and
+    its own admission ticket in the caller's lane.
+    """
+    page_start = time.time()
+    fd, page_path = tempfile.mkstemp(suffix='.png', dir=upload_store.tmp_dir)
+    os.close(fd)
+    # Halaman berjalan di thread pool; pakai keputusan debug dari request
+    debug_artifacts.begin_request(state=debug_state)
+    try:
+        image.save(page_path)
+        deadline = Deadline(budget_ms, start=page_start)
+        ticket = _acquire_page_slot(lane, client_id, deadline)
+        try:
+            result = run_ocr_pipeline(page_path, ocr_mode, use_triage=use_triage, deadline=deadline, lang=lang)
+        finally:
+            admission_controller.release(ticket)
+        result.update({
+            'type': 'page',
+            'page': page_no,
+            'success': True,
+            'processing_time': round(time.time() - page_start, 3),
+            'budget': deadline.to_dict(),
+        })
+        return result
+    except Exception as e:
+        print(f"Error processing page {page_no}: {e}")
+        return {
+            'type': 'page',
+            'page': page_no,
+            'success': False,
+            'error': str(e)[:200]
+        }
+    finally:
+        debug_artifacts.end_request()
+        try:
+            os.remove(page_path)
+        except OSError:
+            pass
+
+def _acquire_page_slot(lane, client_id, deadline):
+    """
+    Admission ticket for one document page. Pages of the same document
+    compete with each other for the client's limit, so a rejection is
+    retried after Retry-After until the page budget runs out.
+    """
+    while True:
+        try:
+            return admission_controller.acquire(lane, client_id, timeout=max(0.0, deadline.remaining()))
+        except AdmissionRejected as e:
+            wait = min(e.retry_after, deadline.remaining())
+            if wait <= 0:
+                raise
+            time.sleep(wait)
+
+def _stream_document(stored, filename, ext, ocr_mode, use_triage, lang, lane, client_id, budget_ms, dpi, start_time):
+    """
+    Stream per-page OCR results of a multi-page document as NDJSON.
+    Pages are rasterized lazily and OCRed on the page pool; results are
+    written in page order as soon as each one is ready.
+    """
+    try:
+        page_count = documents.count_pages(stored.path, ext)
+    except documents.DocumentError as e:
+        upload_store.release(stored)
+        return jsonify({
+            'success': False,
+            'error': str(e)[:200]
+        }), 400
+
+    debug_state = debug_artifacts.current_state()
+
+    def ocr_page(page_no, image):
+        return _ocr_page_image(page_no, image, ocr_mode, use_triage, lang, lane, client_id, budget_ms, debug_state)
+
+    # Dilepas saat stream selesai atau saat response ditutup (mis. klien
+    # putus sebelum chunk pertama, ketika finally generator tidak pernah jalan)
+    release_lock = threading.Lock()
+    pending = [stored]
+
+    def release_upload():
+        with release_lock:
+            upload = pending.pop() if pending else None
+        upload_store.release(upload)
+
+    def generate():
+        pages_done = 0
+        try:
+            yield json.dumps({
+                'type': 'document',
+                'filename': filename,
+                'content_hash': stored.content_hash,
+                'page_count': min(page_count, documents.MAX_PAGES),
+                'dpi': dpi,
+            }) + '\n'
+
+            pages = documents.iter_pages(stored.path, ext, dpi=dpi, page_count=page_count)
+            for result in documents.map_pages_ordered(pages, ocr_page):
+                pages_done += 1
+                yield json.dumps(result) + '\n'
+
+            yield json.dumps({
+                'type': 'done',
+                'success': True,
+                'pages_processed': pages_done,
+                'processing_time': round(time.time() - start_time, 3),
+            }) + '\n'
+        except Exception as e:
+            print(f"Error streaming document: {e}")
+            yield json.dumps({
+                'type': 'done',
+                'success': False,
+                'pages_processed': pages_done,
+                'error': str(e)[:200]
+            }) + '\n'
+        finally:
+            release_upload()
 
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.call_on_close(release_upload)
+    return response
 
 @app.errorhandler(404)
 def not_found(e):
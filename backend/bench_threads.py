@@ -0,0 +1,143 @@
+"""
+Benchmark OCR throughput versus request concurrency, with and without
+thread governance.
+
+Each mode runs in its own process because TensorFlow thread settings
+cannot change once the runtime has started:
+
+    python bench_threads.py
+    python bench_threads.py --concurrency 1,2,4,8,16 --requests 32
+    python bench_threads.py --tesseract-cmd /usr/bin/tesseract
+
+The workers import app, so the full stack must be installed: the packages
+from requirements.txt including TensorFlow, and the Tesseract binary
+(--tesseract-cmd when it is not at the path configured in app.py).
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+SAMPLE_LINES = [
+    'Invoice 2024-117 PT Sumber Makmur',
+    'Jumlah yang harus dibayar Rp 1.250.000',
+    'The quick brown fox jumps over the lazy dog',
+    'Terima kasih atas kepercayaan Anda',
+]
+
+def make_sample_image(path):
+    """Synthetic document with a few lines of printed text"""
+    img = np.full((420, 1100, 3), 255, dtype=np.uint8)
+    for i, line in enumerate(SAMPLE_LINES):
+        cv2.putText(img, line, (40, 80 + i * 90), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+    cv2.imwrite(path, img)
+
+def run_worker(concurrency_levels, total_requests, tesseract_cmd=None):
+    """Run inside a child process: import the app with the current environment and measure"""
+    import app
+
+    if tesseract_cmd:
+        app.pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    app.load_model()
+    fd, sample_path = tempfile.mkstemp(suffix='.png')
+    os.close(fd)
+    make_sample_image(sample_path)
+
+    def one_request():
+        # Dengan governance, request masuk lewat admission controller seperti di server
+        ticket = None
+        if app.resources.THREAD_GOVERNANCE:
+            ticket = app.admission_controller.acquire(app.DEFAULT_LANE, str(threading.get_ident()))
+        try:
+            app.run_ocr_pipeline(sample_path, 'auto', use_triage=False)
+            processed = app.preprocess_image(sample_path)
+            if processed is not None:
+                app.predict_text(processed)
+        finally:
+            if ticket is not None:
+                app.admission_controller.release(ticket)
+
+    one_request()  # pemanasan (load model Tesseract, graph Keras)
+
+    try:
+        for concurrency in concurrency_levels:
+            remaining = [total_requests]
+            lock = threading.Lock()
+            latencies = []
+
+            def client():
+                while True:
+                    with lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                    start = time.time()
+                    one_request()
+                    with lock:
+                        latencies.append(time.time() - start)
+
+            start = time.time()
+            threads = [threading.Thread(target=client) for _ in range(concurrency)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.time() - start
+
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(f"{concurrency}\t{total_requests / elapsed:.2f}\t{np.mean(latencies):.3f}\t{p95:.3f}", flush=True)
+    finally:
+        os.remove(sample_path)
+
+def run_mode(governed, concurrency_levels, total_requests, tesseract_cmd=None):
+    env = dict(os.environ)
+    env['OCR_THREAD_GOVERNANCE'] = '1' if governed else '0'
+    if not governed:
+        env.pop('OMP_THREAD_LIMIT', None)
+    cmd = [sys.executable, __file__, '--worker',
+           '--concurrency', ','.join(str(c) for c in concurrency_levels),
+           '--requests', str(total_requests)]
+    if tesseract_cmd:
+        cmd += ['--tesseract-cmd', tesseract_cmd]
+    output = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True).stdout
+
+    rows = {}
+    for line in output.splitlines():
+        parts = line.split('\t')
+        if len(parts) == 4 and parts[0].isdigit():
+            rows[int(parts[0])] = [float(p) for p in parts[1:]]
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='1,2,4,8,16')
+    parser.add_argument('--requests', type=int, default=24)
+    parser.add_argument('--tesseract-cmd', help='path of the tesseract binary')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(',') if c]
+
+    if args.worker:
+        run_worker(levels, args.requests, args.tesseract_cmd)
+        return
+
+    print(f"CPU count: {os.cpu_count()}, requests per level: {args.requests}")
+    before = run_mode(False, levels, args.requests, args.tesseract_cmd)
+    after = run_mode(True, levels, args.requests, args.tesseract_cmd)
+
+    print(f"{'concurrency':>11} | {'before req/s':>12} {'p95 s':>7} | {'after req/s':>11} {'p95 s':>7}")
+    for level in levels:
+        b = before.get(level, [0, 0, 0])
+        a = after.get(level, [0, 0, 0])
+        print(f"{level:>11} | {b[0]:>12.2f} {b[2]:>7.3f} | {a[0]:>11.2f} {a[2]:>7.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import os
+import time
+
+# Batas waktu default per request (bisa diganti oleh client)
+DEFAULT_DEADLINE_MS = int(os.environ.get('OCR_DEFAULT_DEADLINE_MS', '15000'))
+MAX_DEADLINE_MS = int(os.environ.get('OCR_MAX_DEADLINE_MS', '60000'))
+MIN_DEADLINE_MS = 100
+
+# Sisa waktu minimum sebelum memulai tahap fallback baru
+STAGE_RESERVE = 0.25
+# Timeout minimum untuk satu panggilan Tesseract
+MIN_TESSERACT_TIMEOUT = 0.1
+
+class Deadline:
+    """
+    Time budget for one OCR request.
+    Stages check it between units of work and record where they were cut,
+    so the caller can return the best result so far as partial.
+    """
+
+    def __init__(self, budget_ms=DEFAULT_DEADLINE_MS, start=None):
+        self.budget_ms = budget_ms
+        self.start = start if start is not None else time.time()
+        self.expires_at = self.start + budget_ms / 1000.0
+        self.exhausted = False
+        self.cut_stages = []
+
+    def remaining(self):
+        return self.expires_at - time.time()
+
+    def expired(self, reserve=0.0):
+        return self.remaining() <= reserve
+
+    def mark_exhausted(self, stage):
+        self.exhausted = True
+        if stage not in self.cut_stages:
+            self.cut_stages.append(stage)
+
+    def check(self, stage, reserve=0.0):
+        """Return True when the stage may continue, otherwise record the cut"""
+        if self.expired(reserve):
+            self.mark_exhausted(stage)
+            return False
+        return True
+
+    def tesseract_timeout(self):
+        """Timeout in seconds for a single pytesseract call"""
+        return max(MIN_TESSERACT_TIMEOUT, self.remaining())
+
+    def to_dict(self):
+        return {
+            'budget_ms': self.budget_ms,
+            'elapsed_ms': int((time.time() - self.start) * 1000),
+            'budget_exhausted': self.exhausted,
+            'cut_stages': list(self.cut_stages),
+        }
+
+def deadline_from_request(value, start=None):
+    """Build a Deadline from a client value in milliseconds, clamped to server limits"""
+    try:
+        budget_ms = int(value) if value not in (None, '') else DEFAULT_DEADLINE_MS
+    except (TypeError, ValueError):
+        budget_ms = DEFAULT_DEADLINE_MS
+    budget_ms = max(MIN_DEADLINE_MS, min(budget_ms, MAX_DEADLINE_MS))
+    return Deadline(budget_ms, start=start)
+
+def tesseract_kwargs(deadline):
+    """Extra pytesseract arguments that bound a call by the remaining budget"""
+    if deadline is None:
+        return {}
+    return {'timeout': deadline.tesseract_timeout()}
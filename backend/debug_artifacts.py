@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+import time
+import itertools
+
+import cv2
+
+# Konfigurasi (semua mati secara default)
+DEBUG_ARTIFACTS_ENABLED = os.environ.get('OCR_DEBUG_ARTIFACTS', '0') == '1'
+DEBUG_SAMPLE_EVERY = int(os.environ.get('OCR_DEBUG_SAMPLE_EVERY', '0'))
+DEBUG_ARTIFACTS_DIR = os.environ.get('OCR_DEBUG_DIR', '../static/debug')
+DEBUG_QUEUE_SIZE = int(os.environ.get('OCR_DEBUG_QUEUE_SIZE', '32'))
+DEBUG_MAX_FILES = int(os.environ.get('OCR_DEBUG_MAX_FILES', '200'))
+DEBUG_MAX_AGE = int(os.environ.get('OCR_DEBUG_MAX_AGE', '3600'))
+
+_local = threading.local()
+_request_counter = itertools.count(1)
+_queue = queue.Queue(maxsize=DEBUG_QUEUE_SIZE)
+_writer = None
+_writer_lock = threading.Lock()
+_stats = {'written': 0, 'dropped': 0, 'pruned': 0}
+_stats_lock = threading.Lock()
+
+def begin_request(force=False, state=None):
+    """
+    Decide whether the current request captures debug artifacts.
+    Active when forced, when globally enabled, or every N-th request.
+    Work running on another thread for the same request (e.g. document
+    pages) passes the request's current_state() instead of deciding again.
+    """
+    if state is not None:
+        _local.active, _local.request_no = state
+        return _local.active
+
+    request_no = next(_request_counter)
+    sampled = DEBUG_SAMPLE_EVERY > 0 and request_no % DEBUG_SAMPLE_EVERY == 0
+    _local.active = bool(force or DEBUG_ARTIFACTS_ENABLED or sampled)
+    _local.request_no = request_no
+    return _local.active
+
+def end_request():
+    """Reset per-request debug state"""
+    _local.active = False
+
+def current_state():
+    """Debug decision of the current request, for begin_request(state=...)"""
+    return is_active(), getattr(_local, 'request_no', 0)
+
+def is_active():
+    return getattr(_local, 'active', False)
+
+def debug_print(message):
+    """Print only when the current request is being debugged"""
+    if is_active():
+        print(message)
+
+def artifact_name(source_path, suffix, ext='.png'):
+    """
+    Build an artifact file name from the source image name.
+    Only the base name is used, so relative folders like ../static are safe.
+    """
+    base = os.path.splitext(os.path.basename(source_path))[0] or 'image'
+    request_no = getattr(_local, 'request_no', 0)
+    return f"{request_no:06d}_{base}_{suffix}{ext}"
+
+def save_artifact(name, image):
+    """
+    Queue an image for the background writer.
+    Never blocks; the artifact is dropped when the queue is full.
+    """
+    if not is_active() or image is None:
+        return False
+
+    _ensure_writer()
+    try:
+        _queue.put_nowait((name, image.copy()))
+        return True
+    except queue.Full:
+        _count('dropped')
+        return False
+
+def get_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({
+        'enabled': DEBUG_ARTIFACTS_ENABLED,
+        'sample_every': DEBUG_SAMPLE_EVERY,
+        'queued': _queue.qsize(),
+    })
+    return stats
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            os.makedirs(DEBUG_ARTIFACTS_DIR, exist_ok=True)
+            _writer = threading.Thread(target=_writer_loop, name='debug-artifact-writer', daemon=True)
+            _writer.start()
+
+def _writer_loop():
+    while True:
+        name, image = _queue.get()
+        try:
+            cv2.imwrite(os.path.join(DEBUG_ARTIFACTS_DIR, name), image)
+            _count('written')
+            _prune()
+        except Exception as e:
+            print(f"Error writing debug artifact {name}: {e}")
+        finally:
+            _queue.task_done()
+
+def _prune():
+    """Apply retention limits: drop files older than max age, then oldest beyond max count"""
+    try:
+        entries = []
+        now = time.time()
+        for entry in os.scandir(DEBUG_ARTIFACTS_DIR):
+            if not entry.is_file():
+                continue
+            mtime = entry.stat().st_mtime
+            if DEBUG_MAX_AGE > 0 and now - mtime > DEBUG_MAX_AGE:
+                os.remove(entry.path)
+                _count('pruned')
+            else:
+                entries.append((mtime, entry.path))
+
+        if DEBUG_MAX_FILES > 0 and len(entries) > DEBUG_MAX_FILES:
+            entries.sort()
+            for _, path in entries[:len(entries) - DEBUG_MAX_FILES]:
+                os.remove(path)
+                _count('pruned')
+    except OSError as e:
+        print(f"Error pruning debug artifacts: {e}")
@@ -0,0 +1,119 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+try:
+    from pdf2image import convert_from_path, pdfinfo_from_path
+except:
+    convert_from_path = None
+    pdfinfo_from_path = None
+
+# Konfigurasi dokumen multi-halaman
+DOCUMENT_EXTENSIONS = {'pdf', 'tif', 'tiff', 'gif'}
+DEFAULT_DPI = int(os.environ.get('OCR_PDF_DPI', '200'))
+MIN_DPI = 72
+MAX_DPI = 400
+MAX_PAGES = int(os.environ.get('OCR_MAX_PAGES', '500'))
+PAGE_WORKERS = int(os.environ.get('OCR_PAGE_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+MAX_IN_FLIGHT = int(os.environ.get('OCR_PAGES_IN_FLIGHT', str(PAGE_WORKERS * 2)))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+class DocumentError(Exception):
+    """Raised when a document cannot be opened or rasterized"""
+
+def pdf_supported():
+    return convert_from_path is not None
+
+def parse_dpi(value):
+    """Clamp a client DPI value to the supported range"""
+    try:
+        dpi = int(value) if value not in (None, '') else DEFAULT_DPI
+    except (TypeError, ValueError):
+        dpi = DEFAULT_DPI
+    return max(MIN_DPI, min(dpi, MAX_DPI))
+
+def is_multipage(path, ext):
+    """PDF and TIFF always go through the page pipeline, GIF only when animated"""
+    ext = ext.lower().lstrip('.')
+    if ext in ('pdf', 'tif', 'tiff'):
+        return True
+    if ext == 'gif':
+        try:
+            with Image.open(path) as img:
+                return getattr(img, 'n_frames', 1) > 1
+        except Exception:
+            return False
+    return False
+
+def count_pages(path, ext):
+    ext = ext.lower().lstrip('.')
+    try:
+        if ext == 'pdf':
+            if not pdf_supported():
+                raise DocumentError('PDF support requires pdf2image and poppler')
+            return int(pdfinfo_from_path(path)['Pages'])
+        with Image.open(path) as img:
+            return getattr(img, 'n_frames', 1)
+    except DocumentError:
+        raise
+    except Exception as e:
+        raise DocumentError(f"Cannot open document: {e}")
+
+def iter_pages(path, ext, dpi=DEFAULT_DPI, page_count=None):
+    """
+    Lazily yield (page_number, PIL image) pairs.
+    PDF pages are rasterized one at a time at the given DPI; TIFF/GIF frames
+    are decoded on seek, so only the pages in flight are held in memory.
+    """
+    ext = ext.lower().lstrip('.')
+    if page_count is None:
+        page_count = count_pages(path, ext)
+    page_count = min(page_count, MAX_PAGES)
+
+    if ext == 'pdf':
+        for page_no in range(1, page_count + 1):
+            pages = convert_from_path(path, dpi=dpi, first_page=page_no, last_page=page_no)
+            if pages:
+                yield page_no, pages[0].convert('RGB')
+        return
+
+    with Image.open(path) as img:
+        for index in range(page_count):
+            img.seek(index)
+            yield index + 1, img.convert('RGB')
+
+def map_pages_ordered(pages, ocr_page, max_in_flight=MAX_IN_FLIGHT):
+    """
+    Run ocr_page(page_number, image) on the shared page pool and yield
+    results in page order. At most max_in_flight pages are submitted ahead
+    of the one being yielded, which keeps memory flat for long documents.
+    """
+    executor = _get_executor()
+    in_flight = deque()
+    pages = iter(pages)
+
+    try:
+        for page_no, image in pages:
+            in_flight.append(executor.submit(ocr_page, page_no, image))
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+
+        while in_flight:
+            yield in_flight.popleft().result()
+    finally:
+        # Client terputus: batalkan halaman yang belum mulai
+        for future in in_flight:
+            future.cancel()
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=PAGE_WORKERS, thread_name_prefix='ocr-page')
+    return _executor
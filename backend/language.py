@@ -0,0 +1,112 @@
+import os
+import re
+
+import cv2
+import numpy as np
+
+from budget import tesseract_kwargs
+
+try:
+    import pytesseract
+    from PIL import Image as PILImage
+except:
+    pytesseract = None
+
+# Konfigurasi bahasa
+DEFAULT_LANG = os.environ.get('OCR_DEFAULT_LANG', 'eng+ind')
+SUPPORTED_LANGS = set(os.environ.get('OCR_SUPPORTED_LANGS', 'eng+ind').split('+'))
+AUTO_LANG = 'auto'
+# Dipakai jika deteksi otomatis tidak yakin
+FALLBACK_LANG = DEFAULT_LANG if DEFAULT_LANG != AUTO_LANG else '+'.join(sorted(SUPPORTED_LANGS))
+
+# Deteksi bahasa pada potongan gambar
+SAMPLE_BAND = 0.4
+SAMPLE_MAX_WIDTH = 1200
+MIN_STOPWORD_HITS = 3
+MIN_WINNER_SHARE = 0.75
+
+STOPWORDS = {
+    'eng': {
+        'the', 'and', 'of', 'to', 'in', 'is', 'for', 'that', 'with', 'on', 'are',
+        'this', 'be', 'as', 'by', 'from', 'it', 'at', 'or', 'was', 'have', 'not',
+        'you', 'your', 'will', 'an', 'we', 'our', 'can', 'has',
+    },
+    'ind': {
+        'yang', 'dan', 'di', 'ke', 'dari', 'ini', 'itu', 'untuk', 'dengan', 'tidak',
+        'ada', 'pada', 'dalam', 'akan', 'adalah', 'atau', 'juga', 'oleh', 'karena',
+        'kami', 'saya', 'anda', 'sebagai', 'bisa', 'tersebut', 'telah', 'kita', 'jika',
+    },
+}
+
+def normalize_lang(value):
+    """
+    Validate a lang parameter such as 'eng', 'ind', 'eng+ind' or 'auto'.
+    Raises ValueError for languages the server does not support.
+    """
+    if value is None or not value.strip():
+        return DEFAULT_LANG
+    value = value.strip().lower()
+    if value == AUTO_LANG:
+        return AUTO_LANG
+    langs = [lang for lang in value.split('+') if lang]
+    unsupported = [lang for lang in langs if lang not in SUPPORTED_LANGS]
+    if not langs or unsupported:
+        raise ValueError(f"Unsupported language: {value}. Use {', '.join(sorted(SUPPORTED_LANGS))} or auto")
+    return '+'.join(langs)
+
+def detect_language(image_path, deadline=None):
+    """
+    Pick a single language model from a small sample of the image.
+    Runs one Tesseract pass on the middle band with all supported languages
+    and counts stopwords; falls back to FALLBACK_LANG when not confident.
+    """
+    info = {'detected': None, 'hits': {}, 'fallback': True}
+    if pytesseract is None:
+        return FALLBACK_LANG, info
+
+    try:
+        gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            return FALLBACK_LANG, info
+
+        sample = _sample_region(gray)
+        text = pytesseract.image_to_string(
+            PILImage.fromarray(sample),
+            lang='+'.join(sorted(SUPPORTED_LANGS)),
+            config='--oem 3 --psm 6',
+            **tesseract_kwargs(deadline)
+        )
+
+        words = re.findall(r"[a-z]+", text.lower())
+        hits = {lang: sum(1 for w in words if w in STOPWORDS.get(lang, ())) for lang in SUPPORTED_LANGS}
+        info['hits'] = hits
+
+        total = sum(hits.values())
+        if total >= MIN_STOPWORD_HITS:
+            winner = max(hits, key=hits.get)
+            if hits[winner] / float(total) >= MIN_WINNER_SHARE:
+                info['detected'] = winner
+                info['fallback'] = False
+                return winner, info
+
+        return FALLBACK_LANG, info
+
+    except Exception as e:
+        print(f"Error detecting language: {e}")
+        return FALLBACK_LANG, info
+
+def _sample_region(gray):
+    """Middle horizontal band of the image, Otsu-binarized and capped in width"""
+    h, w = gray.shape
+    band = int(h * SAMPLE_BAND)
+    top = (h - band) // 2
+    sample = gray[top:top + band, :] if band > 0 else gray
+    if np.std(sample) < 8:
+        sample = gray
+
+    sh, sw = sample.shape
+    if sw > SAMPLE_MAX_WIDTH:
+        scale = SAMPLE_MAX_WIDTH / float(sw)
+        sample = cv2.resize(sample, (SAMPLE_MAX_WIDTH, max(1, int(sh * scale))), interpolation=cv2.INTER_AREA)
+
+    return cv2.threshold(sample, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
@@ -0,0 +1,162 @@
+import cProfile
+import hmac
+import io
+import itertools
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+# Konfigurasi profiling (mati secara default)
+PROFILE_SAMPLE_RATE = float(os.environ.get('OCR_PROFILE_SAMPLE_RATE', '0'))
+PROFILE_BUFFER_SIZE = int(os.environ.get('OCR_PROFILE_BUFFER_SIZE', '20'))
+PROFILE_DEFAULT_MODE = os.environ.get('OCR_PROFILE_MODE', 'cprofile')
+ADMIN_TOKEN = os.environ.get('OCR_ADMIN_TOKEN', '')
+SAMPLER_INTERVAL = 0.005
+
+MODE_CPROFILE = 'cprofile'
+MODE_SAMPLE = 'sample'
+
+# Fungsi yang waktunya dilaporkan terpisah
+HOTSPOTS = {
+    'tesseract': ('pytesseract', 'run_tesseract'),
+    'keras_predict': ('keras', 'predict'),
+}
+
+_profiles = deque(maxlen=PROFILE_BUFFER_SIZE)
+_profiles_lock = threading.Lock()
+_profile_ids = itertools.count(1)
+# cProfile hanya boleh aktif satu per proses (Python 3.12+)
+_cprofile_lock = threading.Lock()
+
+def is_admin(token):
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token or '', ADMIN_TOKEN)
+
+def should_profile(requested, token):
+    """Profile when an admin asks for it, or for a random sample of requests"""
+    if requested and is_admin(token):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+class RequestProfiler:
+    """
+    Capture one request's pipeline with cProfile or a stack sampler.
+    cProfile records the time spent waiting on the Tesseract subprocess and
+    inside Keras as part of the calling functions; the sampler produces
+    folded stacks for flamegraphs. Finished traces go to the ring buffer.
+    """
+
+    def __init__(self, label, mode=PROFILE_DEFAULT_MODE):
+        self.label = label
+        self.mode = mode if mode in (MODE_CPROFILE, MODE_SAMPLE) else PROFILE_DEFAULT_MODE
+        self.profile_id = None
+        self._profiler = None
+        self._sampler = None
+        self._stop = threading.Event()
+        self._samples = Counter()
+
+    def __enter__(self):
+        self.start = time.time()
+        if self.mode == MODE_CPROFILE and not _cprofile_lock.acquire(blocking=False):
+            # Profil lain sedang aktif; pakai sampler agar tetap ada trace
+            self.mode = MODE_SAMPLE
+
+        if self.mode == MODE_CPROFILE:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            target = threading.get_ident()
+            self._sampler = threading.Thread(target=self._sample_loop, args=(target,),
+                                             name='profile-sampler', daemon=True)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.time() - self.start
+        record = {
+            'label': self.label,
+            'mode': self.mode,
+            'created': self.start,
+            'duration': round(duration, 4),
+        }
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            _cprofile_lock.release()
+            self._profiler.create_stats()
+            record['stats'] = self._profiler.stats
+            record['hotspots'] = _cprofile_hotspots(self._profiler.stats)
+        else:
+            self._stop.set()
+            self._sampler.join()
+            record['folded'] = self._samples
+            record['hotspots'] = _sample_hotspots(self._samples)
+
+        with _profiles_lock:
+            self.profile_id = next(_profile_ids)
+            record['id'] = self.profile_id
+            _profiles.append(record)
+        return False
+
+    def _sample_loop(self, target):
+        while not self._stop.wait(SAMPLER_INTERVAL):
+            frame = sys._current_frames().get(target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self._samples[';'.join(reversed(stack))] += 1
+
+def list_profiles():
+    with _profiles_lock:
+        return [{key: record[key] for key in ('id', 'label', 'mode', 'created', 'duration', 'hotspots')}
+                for record in _profiles]
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        for record in _profiles:
+            if record['id'] == profile_id:
+                return record
+    return None
+
+def export_pstats(record):
+    """Binary pstats file, loadable with pstats.Stats(path) or snakeviz"""
+    return marshal.dumps(record['stats'])
+
+def export_text(record, limit=40):
+    if 'stats' not in record:
+        return export_collapsed(record)
+    stream = io.StringIO()
+    stats = pstats.Stats(stream=stream)
+    stats.stats = record['stats']
+    stats.get_top_level_stats()
+    stats.sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+def export_collapsed(record):
+    """Folded stacks ('a;b;c count'), input for flamegraph.pl or speedscope"""
+    if 'folded' not in record:
+        raise ValueError('Collapsed stacks are only available for sample profiles')
+    return ''.join(f"{stack} {count}\n" for stack, count in record['folded'].most_common())
+
+def _cprofile_hotspots(stats):
+    result = {name: 0.0 for name in HOTSPOTS}
+    for (filename, _, funcname), (_, _, _, cumulative, _) in stats.items():
+        for name, (module, function) in HOTSPOTS.items():
+            if funcname == function and module in filename:
+                result[name] = max(result[name], cumulative)
+    return {name: round(seconds, 4) for name, seconds in result.items()}
+
+def _sample_hotspots(samples):
+    result = {name: 0 for name in HOTSPOTS}
+    for stack, count in samples.items():
+        for name, (_, function) in HOTSPOTS.items():
+            if f":{function};" in stack + ';':
+                result[name] += count
+    return {name: round(count * SAMPLER_INTERVAL, 4) for name, count in result.items()}
@@ -0,0 +1,53 @@
+import os
+
+import cv2
+
+# Konfigurasi sumber daya CPU
+CPU_COUNT = os.cpu_count() or 1
+THREAD_GOVERNANCE = os.environ.get('OCR_THREAD_GOVERNANCE', '1') != '0'
+# Jumlah proses server (mis. worker gunicorn) yang berbagi mesin
+OCR_WORKERS = int(os.environ.get('OCR_WORKERS', '1'))
+# Jumlah pipeline OCR yang boleh berjalan bersamaan per proses
+OCR_CONCURRENCY = int(os.environ.get('OCR_CONCURRENCY', str(max(1, CPU_COUNT // OCR_WORKERS))))
+
+_settings = {}
+
+def threads_per_request(workers=OCR_WORKERS, concurrency=OCR_CONCURRENCY):
+    """CPU threads each concurrently running OCR request may use"""
+    return max(1, CPU_COUNT // max(1, workers * concurrency))
+
+def configure_threads(workers=OCR_WORKERS, concurrency=OCR_CONCURRENCY):
+    """
+    Size the OpenCV, TensorFlow and Tesseract thread pools so that
+    workers * concurrency requests together use about one thread per core.
+    Must run before TensorFlow executes its first op.
+    """
+    _settings.update({
+        'governed': THREAD_GOVERNANCE,
+        'cpu_count': CPU_COUNT,
+        'workers': workers,
+        'concurrency': concurrency,
+    })
+    if not THREAD_GOVERNANCE:
+        return dict(_settings)
+
+    per_request = threads_per_request(workers, concurrency)
+    _settings['threads_per_request'] = per_request
+
+    # Tesseract (subprocess) membaca batas OpenMP dari environment
+    os.environ['OMP_THREAD_LIMIT'] = str(per_request)
+    cv2.setNumThreads(per_request)
+
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(per_request)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+        _settings['tensorflow'] = True
+    except (ImportError, RuntimeError) as e:
+        print(f"Cannot configure TensorFlow threads: {e}")
+        _settings['tensorflow'] = False
+
+    return dict(_settings)
+
+def get_settings():
+    return dict(_settings)
@@ -0,0 +1,231 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from utils import find_text_boxes, group_boxes_into_lines
+
+# Konfigurasi sesi frame
+SESSION_TTL = int(os.environ.get('OCR_SESSION_TTL', '600'))
+MAX_SESSIONS = int(os.environ.get('OCR_MAX_SESSIONS', '100'))
+MAX_BOX_FRACTION = 0.5
+LINE_GAP_FACTOR = 1.5
+DIFF_THRESHOLD = 25
+DIFF_DILATE = 15
+MIN_CHANGE_AREA = 64
+REGION_MARGIN = 10
+
+class FrameSession:
+    """
+    OCR state for a stream of frames from one client.
+    Keeps the previous grayscale frame and the OCR text of each text region;
+    a new frame only re-detects and re-OCRs the areas that changed.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.lock = threading.Lock()
+        self.prev_gray = None
+        self.regions = []  # [{'box': (x, y, w, h), 'text': str or None, 'confidence': float or None}]
+        self.frames = 0
+        self.last_used = time.time()
+
+    def update(self, gray, ocr_region, deadline=None):
+        """
+        Process a new frame. ocr_region(gray, box) returns (text, confidence).
+        Regions left unread because the deadline ran out keep text None and
+        are retried on the next frame.
+        """
+        self.frames += 1
+        self.last_used = time.time()
+        h, w = gray.shape
+
+        full_frame = self.prev_gray is None or self.prev_gray.shape != gray.shape
+        if full_frame:
+            changed_rects = [(0, 0, w, h)]
+            kept = []
+        else:
+            changed_rects = _changed_rects(self.prev_gray, gray)
+            kept = [r for r in self.regions
+                    if r['text'] is not None and not any(_intersects(r['box'], c) for c in changed_rects)]
+
+        # Area yang berubah diperluas agar mencakup region lama yang terpotong
+        new_boxes = []
+        for rect in changed_rects:
+            rect = _expand(rect, REGION_MARGIN, w, h)
+            for region in self.regions:
+                if _intersects(region['box'], rect):
+                    rect = _union(rect, region['box'])
+            for box in _detect_boxes(gray, rect):
+                if not any(_contains_center(k['box'], box) for k in kept):
+                    new_boxes.append(box)
+
+        # Region yang belum terbaca pada frame sebelumnya dicoba lagi
+        pending = [r['box'] for r in self.regions
+                   if r['text'] is None and r not in kept
+                   and not any(_contains_center(b, r['box']) for b in new_boxes)]
+
+        new_regions = []
+        for box in _dedupe(new_boxes) + pending:
+            region = {'box': box, 'text': None, 'confidence': None}
+            if deadline is None or deadline.check('session_ocr'):
+                try:
+                    region['text'], region['confidence'] = ocr_region(gray, box)
+                except Exception as e:
+                    print(f"Error OCRing session region: {e}")
+            new_regions.append(region)
+
+        self.regions = kept + new_regions
+        self.prev_gray = gray
+
+        text, confidence = self._merged_text()
+        changed_area = sum(cw * ch for _, _, cw, ch in changed_rects)
+        return {
+            'text': text,
+            'confidence': confidence,
+            'frame': self.frames,
+            'full_frame': full_frame,
+            'changed_area_ratio': round(min(1.0, changed_area / float(w * h)), 4),
+            'regions_total': len(self.regions),
+            'regions_reused': len(kept),
+            'regions_ocred': sum(1 for r in new_regions if r['text'] is not None),
+            'regions_pending': sum(1 for r in new_regions if r['text'] is None),
+        }
+
+    def _merged_text(self):
+        """Assemble cached and new region texts in reading order"""
+        by_box = {r['box']: r for r in self.regions}
+        boxes = sorted(by_box, key=lambda box: (box[1] // 20, box[0]))
+
+        lines = []
+        confidences = []
+        for line_boxes in group_boxes_into_lines(boxes):
+            parts = []
+            for box in line_boxes:
+                region = by_box[box]
+                if region['text']:
+                    parts.append(region['text'])
+                    if region['confidence'] is not None:
+                        confidences.append(region['confidence'])
+            if parts:
+                lines.append(' '.join(' '.join(parts).split()))
+
+        confidence = float(np.mean(confidences)) if confidences else 0.0
+        return '\n'.join(lines), confidence
+
+class SessionStore:
+    """Bounded LRU of frame sessions with idle expiry"""
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+    def get(self, session_id):
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = FrameSession(session_id)
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def remove(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def get_stats(self):
+        with self._lock:
+            return {'active': len(self._sessions), 'max_sessions': self.max_sessions, 'ttl': self.ttl}
+
+    def _expire(self):
+        now = time.time()
+        for session_id in [sid for sid, s in self._sessions.items() if now - s.last_used > self.ttl]:
+            del self._sessions[session_id]
+
+def _detect_boxes(gray, rect):
+    """
+    Text line boxes inside rect, in frame coordinates.
+    Text is made the foreground and boxes covering most of the frame
+    (background or panels) are dropped, so they cannot swallow the real
+    text regions and force a full-frame re-OCR.
+    """
+    rx, ry, rw, rh = rect
+    max_area = gray.shape[0] * gray.shape[1] * MAX_BOX_FRACTION
+    boxes = find_text_boxes(gray[ry:ry+rh, rx:rx+rw], text_foreground=True, max_box_area=max_area)
+    boxes = _merge_line_boxes([(bx + rx, by + ry, bw, bh) for bx, by, bw, bh in boxes])
+    return [box for box in boxes if box[2] * box[3] <= max_area]
+
+def _merge_line_boxes(boxes):
+    """Merge overlapping boxes and neighbouring words on the same line into one region"""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                if _same_line(boxes[i], boxes[j]):
+                    boxes[i] = _union(boxes[i], boxes[j])
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return sorted(boxes, key=lambda box: (box[1] // 20, box[0]))
+
+def _same_line(a, b):
+    if _intersects(a, b):
+        return True
+    overlap = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if overlap < 0.5 * min(a[3], b[3]):
+        return False
+    gap = max(a[0], b[0]) - min(a[0] + a[2], b[0] + b[2])
+    return gap < LINE_GAP_FACTOR * max(a[3], b[3])
+
+def _changed_rects(prev_gray, gray):
+    """Bounding rectangles of areas that differ between two frames"""
+    diff = cv2.absdiff(prev_gray, gray)
+    mask = cv2.threshold(diff, DIFF_THRESHOLD, 255, cv2.THRESH_BINARY)[1]
+    if not mask.any():
+        return []
+    mask = cv2.dilate(mask, np.ones((DIFF_DILATE, DIFF_DILATE), np.uint8))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    rects = [cv2.boundingRect(c) for c in contours]
+    return [r for r in rects if r[2] * r[3] >= MIN_CHANGE_AREA]
+
+def _intersects(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ax < bx + bw and ax + aw > bx and ay < by + bh and ay + ah > by
+
+def _union(a, b):
+    x = min(a[0], b[0])
+    y = min(a[1], b[1])
+    return (x, y, max(a[0] + a[2], b[0] + b[2]) - x, max(a[1] + a[3], b[1] + b[3]) - y)
+
+def _expand(rect, margin, width, height):
+    x, y, w, h = rect
+    x0, y0 = max(0, x - margin), max(0, y - margin)
+    x1, y1 = min(width, x + w + margin), min(height, y + h + margin)
+    return (x0, y0, x1 - x0, y1 - y0)
+
+def _contains_center(outer, box):
+    cx = box[0] + box[2] / 2.0
+    cy = box[1] + box[3] / 2.0
+    return outer[0] <= cx < outer[0] + outer[2] and outer[1] <= cy < outer[1] + outer[3]
+
+def _dedupe(boxes):
+    """Drop boxes found twice when expanded change areas overlap"""
+    result = []
+    for box in boxes:
+        if not any(_contains_center(b, box) for b in result):
+            result.append(box)
+    return result
@@ -0,0 +1,217 @@
+import os
+import hashlib
+import shutil
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+# Konfigurasi retensi upload
+UPLOAD_RETENTION = os.environ.get('OCR_UPLOAD_RETENTION', 'persist')  # 'persist' atau 'none'
+UPLOAD_MAX_BYTES = int(os.environ.get('OCR_UPLOAD_MAX_BYTES', str(512 * 1024 * 1024)))
+UPLOAD_MAX_AGE = int(os.environ.get('OCR_UPLOAD_MAX_AGE', str(24 * 3600)))
+UPLOAD_EVICTION_INTERVAL = int(os.environ.get('OCR_UPLOAD_EVICTION_INTERVAL', '60'))
+
+CHUNK_SIZE = 64 * 1024
+TMP_DIRNAME = 'tmp'
+
+StoredUpload = namedtuple('StoredUpload', ['content_hash', 'path', 'size', 'deduplicated'])
+
+class UploadStore:
+    """
+    Content-addressed upload storage.
+    Files live at <root>/<hash[:2]>/<hash[2:4]>/<hash><ext> and are evicted
+    by age and total size. State is kept on the filesystem so several
+    server processes can share the store: every use touches the file's
+    mtime, and each request reads its own hard link in tmp/, so eviction
+    by another process never removes a file a request is still reading.
+    With retention 'none' uploads are kept in a temp file only for the
+    duration of the request.
+    """
+
+    def __init__(self, root, retention=UPLOAD_RETENTION, max_bytes=UPLOAD_MAX_BYTES,
+                 max_age=UPLOAD_MAX_AGE, eviction_interval=UPLOAD_EVICTION_INTERVAL):
+        if retention not in ('persist', 'none'):
+            raise ValueError(f"Unknown upload retention: {retention}")
+        self.root = root
+        self.retention = retention
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.eviction_interval = eviction_interval
+        self.tmp_dir = os.path.join(root, TMP_DIRNAME)
+
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._files = 0
+        self._total_bytes = 0
+        self._evicted = 0
+        self._dedup_hits = 0
+        self._worker = None
+
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._remove_stale_tmp()
+        if self.retention == 'persist':
+            self._scan()
+
+    def put(self, stream, ext=''):
+        """
+        Store an upload stream. The returned path is private to the
+        request and must be handed back with release().
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(suffix=ext, dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+        content_hash = hasher.hexdigest()
+        with self._lock:
+            self._in_use += 1
+
+        if self.retention == 'none':
+            return StoredUpload(content_hash, tmp_path, size, False)
+
+        self._ensure_worker()
+        target = self._shard_path(content_hash, ext)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            # Link dibuat secara atomik; jika sudah ada, file itu dipakai ulang
+            os.link(tmp_path, target)
+            deduplicated = False
+        except FileExistsError:
+            deduplicated = True
+        except OSError:
+            # Filesystem tanpa hard link: simpan salinan terpisah
+            deduplicated = os.path.exists(target)
+            if not deduplicated:
+                shutil.copyfile(tmp_path, target)
+
+        with self._lock:
+            if deduplicated:
+                self._dedup_hits += 1
+            else:
+                self._files += 1
+                self._total_bytes += size
+
+        if deduplicated:
+            try:
+                os.utime(target)
+            except OSError:
+                pass  # baru saja di-evict proses lain; request tetap memakai salinannya
+        return StoredUpload(content_hash, tmp_path, size, deduplicated)
+
+    def release(self, stored):
+        """Remove the request's private copy returned by put()"""
+        if stored is None:
+            return
+        try:
+            os.remove(stored.path)
+        except OSError:
+            pass
+        with self._lock:
+            self._in_use -= 1
+
+    def evict(self):
+        """Remove files older than max_age, then the least recently used beyond max_bytes"""
+        if self.retention != 'persist':
+            return 0
+        now = time.time()
+        files = self._scan()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in sorted(files):
+            too_old = self.max_age > 0 and now - mtime > self.max_age
+            too_big = self.max_bytes > 0 and total > self.max_bytes
+            if not (too_old or too_big):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue  # sudah dihapus proses lain
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self._files = len(files) - removed
+            self._total_bytes = total
+            self._evicted += removed
+        return removed
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'retention': self.retention,
+                'files': self._files,
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'max_age': self.max_age,
+                'in_use': self._in_use,
+                'dedup_hits': self._dedup_hits,
+                'evicted': self._evicted,
+            }
+
+    def _shard_path(self, content_hash, ext):
+        return os.path.join(self.root, content_hash[:2], content_hash[2:4], content_hash + ext)
+
+    def _scan(self):
+        """
+        (mtime, size, path) of every stored file, including those written
+        by other processes; also refreshes the file and byte counts.
+        """
+        files = []
+        for shard in os.listdir(self.root):
+            shard_path = os.path.join(self.root, shard)
+            if shard == TMP_DIRNAME or len(shard) != 2 or not os.path.isdir(shard_path):
+                continue
+            for dirpath, _, filenames in os.walk(shard_path):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+
+        with self._lock:
+            self._files = len(files)
+            self._total_bytes = sum(size for _, size, _ in files)
+        return files
+
+    def _remove_stale_tmp(self):
+        # Sisa file sementara dari proses sebelumnya (worker lain bisa masih aktif)
+        stale_before = time.time() - 3600
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            try:
+                if os.stat(path).st_mtime < stale_before:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _ensure_worker(self):
+        if self.eviction_interval <= 0:
+            return
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._eviction_loop, name='upload-eviction', daemon=True)
+                self._worker.start()
+
+    def _eviction_loop(self):
+        while True:
+            time.sleep(self.eviction_interval)
+            try:
+                self.evict()
+            except Exception as e:
+                print(f"Error evicting uploads: {e}")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modul backend diimpor secara flat (mis. `import triage`), sama seperti app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
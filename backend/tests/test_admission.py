@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, LANE_BULK, LANE_INTERACTIVE, client_identity
+
+def _wait_queued(controller, lane, depth):
+    for _ in range(200):
+        if controller.get_stats()['lanes'][lane]['queue_depth'] >= depth:
+            return
+        time.sleep(0.005)
+    raise AssertionError('tickets were not queued')
+
+def test_free_slots_follow_lane_weights():
+    controller = AdmissionController(1, max_per_client=0)
+    holder = controller.acquire(LANE_INTERACTIVE, 'holder')
+
+    order = []
+    lock = threading.Lock()
+
+    def request(lane, client_id):
+        ticket = controller.acquire(lane, client_id, timeout=5)
+        with lock:
+            order.append(lane)
+        controller.release(ticket)
+
+    threads = [threading.Thread(target=request, args=(LANE_BULK, f"b{i}")) for i in range(2)]
+    threads += [threading.Thread(target=request, args=(LANE_INTERACTIVE, f"i{i}")) for i in range(8)]
+    for t in threads[:2]:
+        t.start()
+    _wait_queued(controller, LANE_BULK, 2)
+    for t in threads[2:]:
+        t.start()
+    _wait_queued(controller, LANE_INTERACTIVE, 8)
+
+    controller.release(holder)
+    for t in threads:
+        t.join()
+
+    # Bobot 4:1, bulk tetap maju tetapi tidak mendahului interactive
+    assert order[:5].count(LANE_BULK) == 1
+    assert order.count(LANE_BULK) == 2
+
+def test_client_over_limit_gets_429():
+    controller = AdmissionController(4, max_per_client=1)
+    ticket = controller.acquire(LANE_INTERACTIVE, 'client')
+    with pytest.raises(AdmissionRejected) as exc:
+        controller.acquire(LANE_INTERACTIVE, 'client')
+    assert exc.value.status == 429
+    assert exc.value.retry_after >= 1
+
+    controller.release(ticket)
+    controller.release(controller.acquire(LANE_INTERACTIVE, 'client'))
+
+def test_queue_timeout_gets_503_and_frees_client():
+    controller = AdmissionController(1, max_per_client=1)
+    ticket = controller.acquire(LANE_BULK, 'a')
+    with pytest.raises(AdmissionRejected) as exc:
+        controller.acquire(LANE_BULK, 'b', timeout=0.05)
+    assert exc.value.status == 503
+
+    controller.release(ticket)
+    stats = controller.get_stats()
+    assert stats['free_slots'] == 1
+    assert stats['lanes'][LANE_BULK]['timed_out'] == 1
+    controller.release(controller.acquire(LANE_BULK, 'b', timeout=1))
+
+def test_unknown_lane_is_rejected_before_queueing():
+    controller = AdmissionController(1)
+    with pytest.raises(ValueError):
+        controller.acquire('urgent', 'client')
+    assert controller.get_stats()['free_slots'] == 1
+
+def test_check_rejects_without_taking_a_slot():
+    controller = AdmissionController(1, max_per_client=1)
+    controller.check(LANE_INTERACTIVE, 'client')
+    assert controller.get_stats()['free_slots'] == 1
+
+    ticket = controller.acquire(LANE_INTERACTIVE, 'client')
+    with pytest.raises(AdmissionRejected) as exc:
+        controller.check(LANE_INTERACTIVE, 'client')
+    assert exc.value.status == 429
+    controller.release(ticket)
+
+def test_client_headers_only_trusted_from_proxies():
+    headers = {'X-Client-Id': 'fresh-id', 'X-Forwarded-For': '203.0.113.7, 10.0.0.2'}
+    assert client_identity('198.51.100.4', headers, trusted_proxies=set()) == '198.51.100.4'
+    assert client_identity('10.0.0.2', headers, trusted_proxies={'10.0.0.2'}) == 'fresh-id'
+    assert client_identity('10.0.0.2', {'X-Forwarded-For': '203.0.113.7, 10.0.0.2'},
+                           trusted_proxies={'10.0.0.2'}) == '203.0.113.7'
@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+import pytest
+
+from sessions import FrameSession
+
+LINES = ['Status: connected', 'Clock 10:01', 'Users online 42']
+
+def _frame(lines, dark=False):
+    background, ink = (30, 255) if dark else (255, 0)
+    img = np.full((400, 900), background, dtype=np.uint8)
+    for i, line in enumerate(lines):
+        cv2.putText(img, line, (40, 80 + i * 120), cv2.FONT_HERSHEY_SIMPLEX, 1.5, ink, 3)
+    return img
+
+class RecordingOcr:
+    def __init__(self):
+        self.boxes = []
+
+    def __call__(self, gray, box):
+        self.boxes.append(box)
+        return f"line@{box[1]}", 0.9
+
+@pytest.mark.parametrize('dark', [False, True])
+def test_only_changed_line_is_ocred(dark):
+    session = FrameSession('test')
+    ocr = RecordingOcr()
+
+    first = session.update(_frame(LINES, dark), ocr)
+    assert first['full_frame']
+    assert len(ocr.boxes) == 3
+
+    ocr.boxes = []
+    changed = list(LINES)
+    changed[1] = 'Clock 10:02'
+    second = session.update(_frame(changed, dark), ocr)
+
+    assert not second['full_frame']
+    assert len(ocr.boxes) == 1
+    x, y, w, h = ocr.boxes[0]
+    # Hanya baris jam (baseline y=200) yang dibaca ulang
+    assert 140 < y + h / 2.0 < 220
+    assert h < 150
+    assert second['regions_reused'] == 2
+    assert len(second['text'].split('\n')) == 3
+
+def test_unchanged_frame_reuses_everything():
+    session = FrameSession('test')
+    ocr = RecordingOcr()
+    session.update(_frame(LINES), ocr)
+    ocr.boxes = []
+    result = session.update(_frame(LINES), ocr)
+    assert ocr.boxes == []
+    assert result['regions_reused'] == 3
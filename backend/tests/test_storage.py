@@ -0,0 +1,76 @@
+import io
+import os
+import time
+
+from storage import UploadStore
+
+def _store(root, **kwargs):
+    kwargs.setdefault('eviction_interval', 0)
+    return UploadStore(str(root), **kwargs)
+
+def _stored_files(root):
+    return sorted(os.path.join(d, n) for d, _, names in os.walk(root) for n in names
+                  if os.path.basename(d) != 'tmp')
+
+def test_same_content_is_stored_once(tmp_path):
+    store = _store(tmp_path)
+    first = store.put(io.BytesIO(b'image bytes'), '.png')
+    second = store.put(io.BytesIO(b'image bytes'), '.png')
+
+    assert first.content_hash == second.content_hash
+    assert not first.deduplicated and second.deduplicated
+    assert first.path != second.path
+    assert len(_stored_files(tmp_path)) == 1
+    assert store.get_stats()['in_use'] == 2
+
+    store.release(first)
+    store.release(second)
+    assert not os.path.exists(first.path) and not os.path.exists(second.path)
+    assert len(_stored_files(tmp_path)) == 1
+    assert store.get_stats()['in_use'] == 0
+
+def test_eviction_by_age_and_size(tmp_path):
+    store = _store(tmp_path, max_bytes=25, max_age=3600)
+    old = store.put(io.BytesIO(b'a' * 10), '.png')
+    middle = store.put(io.BytesIO(b'b' * 10), '.png')
+    new = store.put(io.BytesIO(b'c' * 10), '.png')
+    for stored in (old, middle, new):
+        store.release(stored)
+
+    shard = lambda stored: store._shard_path(stored.content_hash, '.png')
+    now = time.time()
+    os.utime(shard(old), (now - 7200, now - 7200))
+    os.utime(shard(middle), (now - 60, now - 60))
+
+    # 'old' kedaluwarsa; sisanya 20 byte sudah di bawah batas
+    assert store.evict() == 1
+    assert not os.path.exists(shard(old))
+    assert os.path.exists(shard(middle)) and os.path.exists(shard(new))
+    assert store.get_stats()['bytes'] == 20
+
+    store.max_bytes = 15
+    assert store.evict() == 1
+    assert not os.path.exists(shard(middle))
+    assert os.path.exists(shard(new))
+
+def test_eviction_by_another_process_keeps_request_copy(tmp_path):
+    worker_a = _store(tmp_path, max_bytes=1)
+    worker_b = _store(tmp_path, max_bytes=1)
+
+    stored = worker_b.put(io.BytesIO(b'in use by worker b'), '.png')
+    worker_b.release(worker_b.put(io.BytesIO(b'other'), '.png'))
+
+    # Worker A melihat file tulisan worker B dan menghapusnya
+    assert worker_a.evict() == 2
+    assert _stored_files(tmp_path) == []
+    with open(stored.path, 'rb') as f:
+        assert f.read() == b'in use by worker b'
+    worker_b.release(stored)
+
+def test_retention_none_keeps_nothing(tmp_path):
+    store = _store(tmp_path, retention='none')
+    stored = store.put(io.BytesIO(b'private'), '.jpg')
+    assert os.path.exists(stored.path)
+    store.release(stored)
+    assert not os.path.exists(stored.path)
+    assert _stored_files(tmp_path) == []
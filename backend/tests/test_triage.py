@@ -0,0 +1,43 @@
+import cv2
+import numpy as np
+import pytest
+
+import triage
+
+def _banner(path, height, width, text='SALE'):
+    img = np.full((height, width, 3), 255, dtype=np.uint8)
+    scale = height / 60.0
+    cv2.putText(img, text, (int(width * 0.1), int(height * 0.8)), cv2.FONT_HERSHEY_SIMPLEX,
+                scale, (0, 0, 0), max(2, int(scale * 2)))
+    cv2.imwrite(str(path), img)
+    return str(path)
+
+@pytest.mark.parametrize('height, width', [(400, 1800), (500, 2600), (120, 400)])
+def test_large_text_banner_is_not_no_text(tmp_path, height, width):
+    result = triage.triage_image(_banner(tmp_path / 'banner.png', height, width))
+    assert result['category'] == triage.TRIAGE_SPARSE
+
+def test_blank_image_is_no_text(tmp_path):
+    path = str(tmp_path / 'blank.png')
+    cv2.imwrite(path, np.full((300, 300, 3), 240, dtype=np.uint8))
+    result = triage.triage_image(path)
+    assert result['category'] == triage.TRIAGE_NO_TEXT
+    assert result['reason'] == 'blank'
+
+def test_shapes_without_glyphs_are_graphics(tmp_path):
+    path = str(tmp_path / 'logo.png')
+    img = np.full((300, 300, 3), 255, dtype=np.uint8)
+    cv2.rectangle(img, (5, 5), (295, 295), (0, 0, 0), -1)
+    cv2.imwrite(path, img)
+    result = triage.triage_image(path)
+    assert result['category'] == triage.TRIAGE_GRAPHICS
+
+def test_single_line_on_a4_page_is_not_blank(tmp_path):
+    # A4 pada 200 DPI (DPI default dokumen) dengan satu baris teks
+    path = str(tmp_path / 'invoice.png')
+    img = np.full((2339, 1654, 3), 255, dtype=np.uint8)
+    cv2.putText(img, 'Invoice total due Rp 1.250.000', (120, 300), cv2.FONT_HERSHEY_SIMPLEX,
+                1.0, (0, 0, 0), 2)
+    cv2.imwrite(path, img)
+    result = triage.triage_image(path)
+    assert result['category'] == triage.TRIAGE_SPARSE
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Ambang klasifikasi triage
+TRIAGE_MAX_SIDE = 1000
+# Hanya gambar yang benar-benar rata; satu baris teks di halaman A4
+# putih sudah punya std sekitar 7, jadi selebihnya diputuskan oleh kontur
+BLANK_STD_THRESHOLD = 2.0
+MIN_GLYPHS = 1
+MAX_GLYPH_HEIGHT = 0.95
+DENSE_GLYPHS = 60
+MIN_GLYPH_FRACTION = 0.15
+
+TRIAGE_NO_TEXT = 'no_text'
+TRIAGE_GRAPHICS = 'graphics'
+TRIAGE_SPARSE = 'sparse'
+TRIAGE_DENSE = 'dense'
+
+_stage_lock = threading.Lock()
+_stage_times = {}
+STAGE_EMA_ALPHA = 0.2
+
+def triage_image(image_path):
+    """
+    Classify an image as no_text, graphics, sparse or dense before running Tesseract.
+    Uses the same Otsu binarization and external contours as the OCR
+    pipeline, on a downscaled copy so the check stays cheap.
+    Only flat (near-zero std) or contour-free images are no_text; images whose shapes do
+    not look like glyphs are graphics and still get a quick OCR pass.
+    """
+    start = time.time()
+    gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None
+
+    h, w = gray.shape
+    scale = min(1.0, TRIAGE_MAX_SIDE / float(max(h, w)))
+    if scale < 1.0:
+        gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        h, w = gray.shape
+
+    std = float(np.std(gray))
+    stats = {'std': round(std, 2), 'contours': 0, 'glyphs': 0, 'ink_ratio': 0.0}
+
+    if std < BLANK_STD_THRESHOLD:
+        return _result(TRIAGE_NO_TEXT, 'blank', stats, start)
+
+    binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    if np.mean(binary) > 127:
+        binary = cv2.bitwise_not(binary)
+    stats['ink_ratio'] = round(float(np.count_nonzero(binary)) / binary.size, 4)
+
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    stats['contours'] = len(contours)
+
+    # Kontur berukuran karakter: tidak terlalu kecil, tidak setinggi gambar,
+    # rasio aspek tidak ekstrem. Batas relatif terhadap tinggi gambar sehingga
+    # hasilnya tidak bergantung pada ukuran (teks besar pada banner tetap lolos).
+    min_h = max(4, int(h * 0.005))
+    max_h = int(h * MAX_GLYPH_HEIGHT)
+    glyphs = 0
+    shapes = 0
+    for contour in contours:
+        _, _, cw, ch = cv2.boundingRect(contour)
+        if ch < min_h and cw < min_h:
+            continue  # noise
+        shapes += 1
+        if min_h <= ch <= max_h and 0.05 <= cw / float(ch) <= 8:
+            glyphs += 1
+    stats['glyphs'] = glyphs
+
+    if shapes == 0:
+        return _result(TRIAGE_NO_TEXT, 'no_contours', stats, start)
+    if glyphs < MIN_GLYPHS:
+        return _result(TRIAGE_GRAPHICS, 'no_glyphs', stats, start)
+    if glyphs / float(shapes) < MIN_GLYPH_FRACTION:
+        return _result(TRIAGE_GRAPHICS, 'graphics', stats, start)
+    if glyphs < DENSE_GLYPHS:
+        return _result(TRIAGE_SPARSE, 'few_glyphs', stats, start)
+    return _result(TRIAGE_DENSE, 'many_glyphs', stats, start)
+
+def record_stage(stage, seconds):
+    """Keep a moving average of how long each pipeline stage takes"""
+    with _stage_lock:
+        previous = _stage_times.get(stage)
+        if previous is None:
+            _stage_times[stage] = seconds
+        else:
+            _stage_times[stage] = previous + STAGE_EMA_ALPHA * (seconds - previous)
+
+def estimate_stages(stages):
+    """Estimated time of the given stages, from the moving averages"""
+    with _stage_lock:
+        return sum(_stage_times.get(stage, 0.0) for stage in stages)
+
+def get_stage_times():
+    with _stage_lock:
+        return {stage: round(seconds, 4) for stage, seconds in _stage_times.items()}
+
+def _result(category, reason, stats, start):
+    return {
+        'category': category,
+        'reason': reason,
+        'stats': stats,
+        'triage_time': round(time.time() - start, 4),
+    }
@@ -2,6 +2,8 @@ import cv2
 import numpy as np
 import os
 
+from debug_artifacts import save_artifact, artifact_name
+
 def preprocess_for_ocr(image_path):
     """
     Simple preprocessing for OCR
@@ -29,10 +31,8 @@ def preprocess_for_ocr(image_path):
         if np.mean(binary) > 127:
             binary = cv2.bitwise_not(binary)
         
-        # Menyimpan gambar yang diproses untuk debugging
-        debug_path = image_path.replace('.', '_processed.')
-        cv2.imwrite(debug_path, binary)
-        print(f"Processed image saved: {debug_path}")
+        # Menyimpan gambar yang diproses untuk debugging (hanya jika aktif)
+        save_artifact(artifact_name(image_path, 'processed'), binary)
         
         return binary
     
@@ -70,4 +70,80 @@ def segment_characters(image):
     
     except Exception as e:
         print(f"Error in character segmentation: {e}")
-        return [], []
\ No newline at end of file
+        return [], []
+
+def find_text_boxes(gray, text_foreground=False, max_box_area=None):
+    """
+    Find text box candidates in a grayscale image
+    Boxes from Otsu and adaptive thresholds are merged when close or overlapping.
+    text_foreground=True inverts each binary so text is white, and
+    max_box_area drops larger contours before merging (both off for the
+    line OCR path).
+    """
+    methods = [
+        cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1],
+        cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+                            cv2.THRESH_BINARY, 11, 2),
+    ]
+    
+    if text_foreground:
+        methods = [cv2.bitwise_not(b) if np.mean(b) > 127 else b for b in methods]
+    
+    all_boxes = []
+    
+    for binary in methods:
+
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            
+            if max_box_area is not None and w * h > max_box_area:
+                continue
+            
+            if w > 20 and h > 20:
+                merged = False
+                for i, (bx, by, bw, bh) in enumerate(all_boxes):
+                    if (abs(x - bx) < 50 and abs(y - by) < 50) or \
+                    (x < bx + bw and x + w > bx and y < by + bh and y + h > by):
+                        new_x = min(x, bx)
+                        new_y = min(y, by)
+                        new_w = max(x + w, bx + bw) - new_x
+                        new_h = max(y + h, by + bh) - new_y
+                        all_boxes[i] = (new_x, new_y, new_w, new_h)
+                        merged = True
+                        break
+                
+                if not merged:
+                    all_boxes.append((x, y, w, h))
+    
+    all_boxes.sort(key=lambda box: (box[1] // 20, box[0]))
+    
+    return all_boxes
+
+def group_boxes_into_lines(boxes):
+    """
+    Group sorted text boxes into lines, each line sorted left to right
+    """
+    lines = []
+    current_line = []
+    last_y = -1
+    
+    for box in boxes:
+        x, y, w, h = box
+        
+        if last_y == -1:
+            last_y = y
+
+        if abs(y - last_y) > h * 0.5:
+            if current_line:
+                lines.append(sorted(current_line, key=lambda b: b[0]))
+                current_line = []
+        
+        current_line.append(box)
+        last_y = y
+    
+    if current_line:
+        lines.append(sorted(current_line, key=lambda b: b[0]))
+    
+    return lines